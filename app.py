@@ -8,6 +8,8 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from queue import Queue
 from flask import Flask, render_template, request, jsonify, send_file
 import yt_dlp
+from topic_modeling import fit_embedding_topics, online_topics, refresh_online_topics, preprocess_channel
+from audience import update_channel_sketch, load_channel_sketch, audience_overlap
 
 # Number of parallel workers for comment extraction (default to 2 for rate limit safety)
 DEFAULT_WORKERS = 2
@@ -40,6 +42,10 @@ extraction_queue = Queue()
 queue_list = []  # For display purposes
 queue_lock = threading.Lock()
 
+# Per-channel locks for generated topic-model files (preprocessed/, online_topics/, embeddings/)
+channel_locks = {}
+channel_locks_lock = threading.Lock()
+
 
 def get_already_downloaded_video_ids(channel_folder=None):
     """Get all video IDs that have already been downloaded.
@@ -231,6 +237,23 @@ def save_progress(filepath, data, lock):
             json.dump(data, f, ensure_ascii=False, indent=2)
 
 
+def get_channel_lock(channel_dir):
+    """Get the lock serializing topic-model updates of a channel."""
+    with channel_locks_lock:
+        return channel_locks.setdefault(os.path.abspath(channel_dir), threading.Lock())
+
+
+def refresh_channel_topics(channel_dir):
+    """Fold new comments into the channel's online topic model (if one exists)."""
+    try:
+        with get_channel_lock(channel_dir):
+            new_comments = refresh_online_topics(channel_dir)
+        if new_comments:
+            print(f"Online topic model updated with {new_comments} new comments")
+    except Exception as e:
+        print(f"Online topic update error: {e}")
+
+
 def update_extraction_state(**kwargs):
     """Update global extraction state."""
     with extraction_lock:
@@ -253,7 +276,7 @@ def reset_extraction_state():
 
 
 def save_video_json(videos_dir, video_data, lock):
-    """Save a single video's data to its own JSON file."""
+    """Save a single video's data to its own JSON file and update the channel's audience sketch."""
     video_id = video_data.get('video_id')
     if not video_id:
         return
@@ -261,6 +284,11 @@ def save_video_json(videos_dir, video_data, lock):
     with lock:
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(video_data, f, ensure_ascii=False, indent=2)
+        # The sketch is derived data: never let it abort an extraction
+        try:
+            update_channel_sketch(os.path.dirname(videos_dir), video_data)
+        except Exception as e:
+            print(f"Audience sketch update error ({video_id}): {e}")
 
 
 def save_channel_info(channel_dir, channel_info, videos_stats, lock):
@@ -440,6 +468,11 @@ def do_extraction(channel_input, limit=None, skip_existing=False, workers=None):
 
         reset_extraction_state()
 
+        # Fold the new comments into the online topic model in the background,
+        # so the extraction is reported finished and the next queued one can start
+        if successful_videos > 0:
+            threading.Thread(target=refresh_channel_topics, args=(channel_dir,), daemon=True).start()
+
         return {
             'success': not rate_limit_hit,
             'channel_name': channel_name,
@@ -734,6 +767,110 @@ def get_file_detail(folder):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/audience-overlap')
+def get_audience_overlap():
+    """Estimated shared commenters / Jaccard similarity between channels.
+
+    Optional query parameter: channels=@a,@b (defaults to all channel folders).
+    """
+    output_dir = app.config['OUTPUT_DIR']
+    channels_param = request.args.get('channels', '')
+    if channels_param:
+        folders = [ch.strip() for ch in channels_param.split(',') if ch.strip()]
+    else:
+        folders = sorted(f for f in os.listdir(output_dir) if os.path.isdir(os.path.join(output_dir, f)))
+
+    missing = [f for f in folders if not os.path.isdir(os.path.join(output_dir, f))]
+    if missing:
+        return jsonify({'error': f"Channel folder not found: {', '.join(missing)}"}), 404
+
+    try:
+        sketches = {f: load_channel_sketch(os.path.join(output_dir, f)) for f in folders}
+        return jsonify(audience_overlap(sketches))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/preprocess', methods=['POST'])
+def preprocess_comments():
+    """Preprocess a channel's comments into the token-id corpus (only new videos are processed)."""
+    data = request.json or {}
+    folder = data.get('folder', '')
+    channel_dir = os.path.join(app.config['OUTPUT_DIR'], folder)
+
+    if not folder or not os.path.isdir(channel_dir):
+        return jsonify({'error': 'Channel folder not found'}), 404
+
+    try:
+        with get_channel_lock(channel_dir):
+            corpus = preprocess_channel(channel_dir)
+        return jsonify({
+            'folder': folder,
+            'total_comments': len(corpus),
+            'total_tokens': int(len(corpus.token_ids)),
+            'vocabulary_size': corpus.vocab_size,
+            'languages': corpus.language_counts(),
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/topics/online', methods=['POST'])
+def online_topic_evolution():
+    """Update a channel's online topic model with new comments and return topic prevalence over time."""
+    data = request.json or {}
+    folder = data.get('folder', '')
+    channel_dir = os.path.join(app.config['OUTPUT_DIR'], folder)
+
+    if not folder or not os.path.isdir(channel_dir):
+        return jsonify({'error': 'Channel folder not found'}), 404
+
+    try:
+        # Without n_topics, keep the checkpoint's topic count
+        n_topics = data.get('n_topics')
+        with get_channel_lock(channel_dir):
+            result = online_topics(
+                channel_dir,
+                n_topics=int(n_topics) if n_topics is not None else None,
+                bucket=data.get('bucket', 'month'),
+                reset=bool(data.get('reset', False)),
+            )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    result['folder'] = folder
+    return jsonify(result)
+
+
+@app.route('/api/topics/embedding', methods=['POST'])
+def embedding_topics():
+    """Embedding-based (BERTopic-style) topic modeling for a channel folder."""
+    data = request.json or {}
+    folder = data.get('folder', '')
+    channel_dir = os.path.join(app.config['OUTPUT_DIR'], folder)
+
+    if not folder or not os.path.isdir(channel_dir):
+        return jsonify({'error': 'Channel folder not found'}), 404
+
+    try:
+        with get_channel_lock(channel_dir):
+            result = fit_embedding_topics(
+                channel_dir,
+                dtype=data.get('dtype', 'float16'),
+                n_neighbors=int(data.get('n_neighbors', 15)),
+                min_topic_size=int(data.get('min_topic_size', 10)),
+            )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    result['folder'] = folder
+    return jsonify(result)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='YouTube Comments Scraper')
     parser.add_argument('--port', type=int, default=4242, help='Port to run the server on (default: 4242)')
@@ -0,0 +1,130 @@
+import os
+import json
+
+import numpy as np
+
+from audience import (AudienceSketch, HLL_PRECISION, audience_overlap, hash_ids, load_channel_sketch,
+                      update_channel_sketch)
+
+
+def _sketch(ids):
+    sketch = AudienceSketch()
+    sketch.add(ids)
+    return sketch
+
+
+def _ids(start, stop):
+    return [f'UC{i:08d}' for i in range(start, stop)]
+
+
+def _write_video(channel_dir, video_id, author_ids):
+    os.makedirs(os.path.join(channel_dir, 'videos'), exist_ok=True)
+    video_data = {'video_id': video_id, 'comments': [{'author_id': a, 'text': 'hi'} for a in author_ids]}
+    with open(os.path.join(channel_dir, 'videos', f'{video_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump(video_data, f)
+    return video_data
+
+
+def test_register_ranks_count_leading_zeros():
+    ids = _ids(0, 200)
+    sketch = _sketch(ids)
+
+    expected = np.zeros_like(sketch.registers)
+    suffix_bits = 64 - HLL_PRECISION
+    for h in hash_ids(ids).tolist():
+        rest = h & ((1 << suffix_bits) - 1)
+        index = h >> suffix_bits
+        expected[index] = max(expected[index], suffix_bits - rest.bit_length() + 1)
+    assert (sketch.registers == expected).all()
+
+
+def test_cardinality_matches_exact_counts():
+    # 0.8% standard error for HyperLogLog; linear counting is tighter on small sets
+    for n, tolerance in ((10, 0.0), (1000, 0.02), (20000, 0.03), (200000, 0.03)):
+        estimate = _sketch(_ids(0, n)).cardinality()
+        assert abs(estimate - n) <= tolerance * n + 0.5
+
+    assert AudienceSketch().cardinality() == 0
+
+
+def test_merged_sketches_equal_sketch_of_union():
+    a, b = _sketch(_ids(0, 3000)), _sketch(_ids(2000, 5000))
+    union = _sketch(_ids(0, 5000))
+    assert (np.maximum(a.registers, b.registers) == union.registers).all()
+    assert (np.minimum(a.signature, b.signature) == union.signature).all()
+
+
+def test_overlap_matches_exact_jaccard_and_shared_counts():
+    sets = {'a': set(_ids(0, 6000)), 'b': set(_ids(3000, 12000)), 'c': set(_ids(20000, 21000))}
+    overlap = audience_overlap({name: _sketch(ids) for name, ids in sets.items()})
+
+    names = overlap['channels']
+    for i, x in enumerate(names):
+        for j, y in enumerate(names):
+            shared = len(sets[x] & sets[y])
+            jaccard = shared / len(sets[x] | sets[y])
+            # 1.5% standard error on Jaccard
+            assert abs(overlap['jaccard'][i][j] - jaccard) < 0.05
+            assert abs(overlap['shared_commenters'][i][j] - shared) <= 0.1 * max(shared, 100)
+
+    assert abs(overlap['total_unique_commenters'] - 13000) < 0.03 * 13000
+
+
+def test_shared_commenters_are_clamped_to_channel_sizes():
+    small, large = _sketch(_ids(0, 50)), _sketch(_ids(0, 5000))
+    overlap = audience_overlap({'small': small, 'large': large})
+    shared = overlap['shared_commenters'][0][1]
+    assert shared <= overlap['unique_commenters']['small']
+    assert shared == overlap['shared_commenters'][1][0]
+
+
+def test_empty_channel_overlaps_with_nothing():
+    overlap = audience_overlap({'a': _sketch(_ids(0, 100)), 'empty': AudienceSketch()})
+    assert overlap['jaccard'] == [[1.0, 0.0], [0.0, 0.0]]
+    assert overlap['shared_commenters'][1] == [0, 0]
+    assert overlap['unique_commenters']['empty'] == 0
+
+    assert audience_overlap({})['jaccard'] == []
+
+
+def test_readding_a_video_is_idempotent():
+    video_data = {'video_id': 'v1', 'comments': [{'author_id': a} for a in _ids(0, 500)] + [{'author_id': None}]}
+    sketch = AudienceSketch()
+    sketch.add_video(video_data)
+    registers, signature = sketch.registers.copy(), sketch.signature.copy()
+
+    sketch.add_video(video_data)
+    assert (sketch.registers == registers).all()
+    assert (sketch.signature == signature).all()
+    assert sketch.video_ids == {'v1'}
+
+
+def test_save_load_round_trip(tmp_path):
+    sketch = _sketch(_ids(0, 1000))
+    sketch.video_ids = {'v1', 'v2'}
+    sketch.save(str(tmp_path))
+
+    loaded = AudienceSketch.load(str(tmp_path))
+    assert (loaded.registers == sketch.registers).all()
+    assert (loaded.signature == sketch.signature).all()
+    assert loaded.video_ids == {'v1', 'v2'}
+    assert os.listdir(tmp_path) == ['audience.npz']
+
+    assert AudienceSketch.load(str(tmp_path / 'missing')).video_ids == set()
+
+
+def test_load_channel_sketch_backfills_missing_videos(tmp_path):
+    channel_dir = str(tmp_path)
+    first = _write_video(channel_dir, 'v1', _ids(0, 300))
+    update_channel_sketch(channel_dir, first)
+    _write_video(channel_dir, 'v2', _ids(200, 600))
+    assert AudienceSketch.load(channel_dir).video_ids == {'v1'}
+
+    sketch = load_channel_sketch(channel_dir)
+    expected = _sketch(_ids(0, 600))
+    assert sketch.video_ids == {'v1', 'v2'}
+    assert (sketch.registers == expected.registers).all()
+    assert (sketch.signature == expected.signature).all()
+
+    # The backfill was saved
+    assert AudienceSketch.load(channel_dir).video_ids == {'v1', 'v2'}
@@ -0,0 +1,94 @@
+import tracemalloc
+
+import numpy as np
+
+from topic_modeling.ann import IVFIndex
+from topic_modeling.embedding_topics import cluster_embeddings, class_tfidf
+from topic_modeling.preprocessing import encode_tokens, count_matrix
+
+
+def _blobs(n_blobs, size, noise, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.eye(dim)[:n_blobs]
+    vectors = np.vstack([c + noise * rng.standard_normal((size, dim)) for c in centers])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    truth = np.repeat(np.arange(n_blobs), size)
+    return vectors.astype(np.float16), truth
+
+
+def _assert_recovers(labels, truth):
+    n_blobs = truth.max() + 1
+    assert labels.max() + 1 == n_blobs
+    for blob in range(n_blobs):
+        blob_labels = labels[truth == blob]
+        assert (blob_labels >= 0).mean() > 0.9
+        assert len(np.unique(blob_labels[blob_labels >= 0])) == 1
+
+
+def test_separated_blobs_become_topics():
+    for noise in (0.02, 0.05, 0.1):
+        vectors, truth = _blobs(4, 500, noise)
+        _assert_recovers(cluster_embeddings(vectors, min_topic_size=10), truth)
+
+
+def test_duplicate_groups_become_topics():
+    vectors, truth = _blobs(5, 400, 0.0)
+    _assert_recovers(cluster_embeddings(vectors, min_topic_size=10), truth)
+
+
+def test_small_components_are_outliers():
+    vectors, _ = _blobs(2, 5, 0.0)
+    assert (cluster_embeddings(vectors, n_neighbors=4, min_topic_size=10) == -1).all()
+
+
+def test_zero_vectors_are_outliers_and_not_indexed():
+    vectors, truth = _blobs(3, 300, 0.05)
+    zeros = np.zeros((200, vectors.shape[1]), dtype=vectors.dtype)
+    vectors = np.vstack([vectors, zeros])
+
+    index = IVFIndex().fit(vectors)
+    indexed = np.concatenate(index.lists)
+    assert len(indexed) == len(truth)
+    assert (indexed < len(truth)).all()
+
+    labels = cluster_embeddings(vectors, min_topic_size=10)
+    assert (labels[len(truth):] == -1).all()
+    _assert_recovers(labels[:len(truth)], truth)
+
+
+def test_ivf_scoring_memory_is_bounded():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((40000, 16)).astype(np.float32)
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float16)
+
+    tracemalloc.start()
+    try:
+        index = IVFIndex().fit(vectors)
+        distances, indices = index.kneighbors(10)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # Scoring all rows against all centroids in one block took ~500 MB here
+    assert peak < 64 * 2 ** 20
+    assert (indices >= 0).all()
+    assert (np.diff(distances, axis=1) >= 0).all()
+
+    # Approximate neighbours should mostly match the exact ones
+    queries = rng.choice(len(vectors), 200, replace=False)
+    exact = np.argsort(-(vectors[queries].astype(np.float32) @ vectors.astype(np.float32).T), axis=1)[:, 1:11]
+    recall = np.mean([len(np.intersect1d(a, b)) / 10 for a, b in zip(exact, indices[queries])])
+    assert recall > 0.5
+
+
+def test_keywords_follow_corpus_rows():
+    corpus_texts = ['pizza pasta cheese', 'guitar drums bass', 'pizza cheese oven', 'guitar bass concert']
+    token_ids, offsets, vocab = encode_tokens([t.split() for t in corpus_texts])
+    counts = count_matrix(token_ids, offsets, len(vocab))
+    terms = sorted(vocab, key=vocab.get)
+
+    # Labels are in a different row order than the corpus
+    rows = np.array([1, 3, 0, 2])
+    words = class_tfidf(counts[rows], terms, np.array([0, 0, 1, 1]), 2)
+    assert set(words[0]) == {'guitar', 'bass'}
+    assert set(words[1]) == {'pizza', 'cheese'}
@@ -0,0 +1,132 @@
+import os
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from sklearn.decomposition import LatentDirichletAllocation
+
+from topic_modeling import online, preprocessing
+from topic_modeling.online import online_topics, topic_prevalence, update_online_topics
+
+TEXTS = ['pizza pasta cheese recipe', 'guitar drums bass concert', 'pizza oven cheese crust',
+         'bass guitar solo concert', 'pasta sauce recipe tomato']
+
+
+def _day(year, month, day):
+    return int(datetime(year, month, day, tzinfo=timezone.utc).timestamp()) // 86400
+
+
+def _write_video(channel_dir, video_id, timestamp=None):
+    os.makedirs(os.path.join(channel_dir, 'videos'), exist_ok=True)
+    comments = [{'text': t, 'timestamp': timestamp} for t in TEXTS]
+    with open(os.path.join(channel_dir, 'videos', f'{video_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump({'video_id': video_id, 'comments': comments}, f)
+
+
+@pytest.fixture
+def fed_rows(monkeypatch):
+    """Record how many rows each partial_fit call receives."""
+    rows = []
+    original = LatentDirichletAllocation.partial_fit
+    monkeypatch.setattr(LatentDirichletAllocation, 'partial_fit',
+                        lambda self, X, y=None: rows.append(X.shape[0]) or original(self, X))
+    return rows
+
+
+def test_updates_only_feed_new_videos(tmp_path, fed_rows):
+    channel_dir = str(tmp_path)
+    _write_video(channel_dir, 'a', 1700000000)
+    _write_video(channel_dir, 'b', 1700000000)
+    _, state, new_comments = update_online_topics(channel_dir, n_topics=3, workers=1)
+    assert new_comments == 10 and sum(fed_rows) == 10
+    assert state['videos'] == ['a', 'b']
+
+    fed_rows.clear()
+    assert update_online_topics(channel_dir, workers=1)[2] == 0
+    assert fed_rows == []
+
+    _write_video(channel_dir, 'c', 1700000000)
+    _, state, new_comments = update_online_topics(channel_dir, workers=1)
+    assert new_comments == 5 and sum(fed_rows) == 5
+    assert state['videos'] == ['a', 'b', 'c']
+    assert state['total_comments'] == 15
+
+
+def test_n_topics_defaults_to_the_checkpoint(tmp_path):
+    channel_dir = str(tmp_path)
+    _write_video(channel_dir, 'a')
+    update_online_topics(channel_dir, n_topics=4, workers=1)
+
+    _write_video(channel_dir, 'b')
+    model, state, new_comments = update_online_topics(channel_dir, workers=1)
+    assert state['n_topics'] == 4 and model.n_components == 4
+    assert new_comments == 5
+
+    # reset keeps the count too; a fresh channel gets the default
+    assert update_online_topics(channel_dir, reset=True, workers=1)[1]['n_topics'] == 4
+    other_dir = str(tmp_path / 'other')
+    _write_video(other_dir, 'a')
+    assert update_online_topics(other_dir, workers=1)[1]['n_topics'] == online.DEFAULT_TOPICS
+
+
+def test_model_is_rebuilt_for_new_n_topics_or_rules(tmp_path, monkeypatch):
+    channel_dir = str(tmp_path)
+    _write_video(channel_dir, 'a', 1700000000)
+    _write_video(channel_dir, 'b', 1700000000)
+    update_online_topics(channel_dir, n_topics=3, workers=1)
+
+    model, state, new_comments = update_online_topics(channel_dir, n_topics=5, workers=1)
+    assert model.n_components == 5
+    assert new_comments == 10 and state['total_comments'] == 10
+    assert state['daily'][str(1700000000 // 86400)][0] == 10
+
+    monkeypatch.setattr(online, 'PREPROCESSING_VERSION', preprocessing.PREPROCESSING_VERSION + 1)
+    monkeypatch.setattr(preprocessing, 'PREPROCESSING_VERSION', preprocessing.PREPROCESSING_VERSION + 1)
+    _, state, new_comments = update_online_topics(channel_dir, workers=1)
+    assert new_comments == 10 and state['total_comments'] == 10
+    assert state['preprocessing'] == online.PREPROCESSING_VERSION
+
+
+def test_undated_comments_train_but_are_not_bucketed(tmp_path, fed_rows):
+    channel_dir = str(tmp_path)
+    _write_video(channel_dir, 'a', 1700000000)
+    _write_video(channel_dir, 'b')
+    _, state, _ = update_online_topics(channel_dir, n_topics=3, workers=1)
+    assert sum(fed_rows) == 10
+    assert sum(count for count, _ in state['daily'].values()) == 5
+
+
+def test_prevalence_buckets_average_topic_shares():
+    state = {'n_topics': 2, 'daily': {
+        str(_day(2023, 12, 31)): [1, [1.0, 0.0]],  # Sunday, ISO week 2023-W52
+        str(_day(2024, 1, 1)): [3, [1.0, 2.0]],  # Monday, ISO week 2024-W01
+        str(_day(2024, 1, 7)): [1, [0.0, 1.0]],  # Sunday, ISO week 2024-W01
+        str(_day(2024, 2, 1)): [2, [0.5, 1.5]],
+    }}
+
+    month = topic_prevalence(state, 'month')
+    assert month['periods'] == ['2023-12', '2024-01', '2024-02']
+    assert month['comment_counts'] == [1, 4, 2]
+    assert np.allclose(month['prevalence'], [[1.0, 0.0], [0.25, 0.75], [0.25, 0.75]])
+
+    week = topic_prevalence(state, 'week')
+    assert week['periods'] == ['2023-W52', '2024-W01', '2024-W05']
+    assert week['comment_counts'] == [1, 4, 2]
+
+    day = topic_prevalence(state, 'day')
+    assert day['periods'] == ['2023-12-31', '2024-01-01', '2024-01-07', '2024-02-01']
+    assert np.allclose(day['prevalence'][1], [1 / 3, 2 / 3], atol=1e-4)
+
+    with pytest.raises(ValueError):
+        topic_prevalence(state, 'year')
+
+
+def test_online_topics_reports_topics_and_evolution(tmp_path):
+    channel_dir = str(tmp_path)
+    _write_video(channel_dir, 'a', 1700000000)
+    result = online_topics(channel_dir, n_topics=2)
+    assert result['n_topics'] == 2 and len(result['topics']) == 2
+    assert all(topic['words'] for topic in result['topics'])
+    assert result['evolution']['periods'] == ['2023-11']
+    assert np.isclose(sum(result['evolution']['prevalence'][0]), 1.0, atol=1e-3)
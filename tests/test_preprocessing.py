@@ -0,0 +1,70 @@
+import os
+import json
+
+from topic_modeling import corpus as corpus_module, preprocessing
+from topic_modeling.preprocessing import lemmatize, preprocess_channel
+
+
+def test_double_s_words_keep_their_ending():
+    for word in ('boss', 'stress', 'business'):
+        assert lemmatize(word, 'fr') == word
+        assert lemmatize(word, 'en') == word
+
+
+def test_plurals_fold_to_base_form():
+    french = ('chats', 'journaux', 'chevaux', 'vidéos')
+    assert [lemmatize(w, 'fr') for w in french] == ['chat', 'journal', 'cheval', 'vidéo']
+    english = ('cats', 'cities', 'movies', 'bosses')
+    assert [lemmatize(w, 'en') for w in english] == ['cat', 'city', 'movie', 'boss']
+
+
+def test_suffix_rule_exceptions():
+    french = ('tuyaux', 'matériaux', 'vitraux', 'chevaux')
+    assert [lemmatize(w, 'fr') for w in french] == ['tuyau', 'matériau', 'vitrail', 'cheval']
+    english = ('gloves', 'drives', 'curves', 'olives', 'archives', 'knives', 'leaves', 'wolves')
+    assert [lemmatize(w, 'en') for w in english] == ['glove', 'drive', 'curve', 'olive', 'archive',
+                                                     'knife', 'leaf', 'wolf']
+
+
+def _write_video(channel_dir, video_id, texts):
+    os.makedirs(os.path.join(channel_dir, 'videos'), exist_ok=True)
+    with open(os.path.join(channel_dir, 'videos', f'{video_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump({'video_id': video_id, 'comments': [{'text': t} for t in texts]}, f)
+
+
+def test_corpus_only_reads_new_videos(tmp_path, monkeypatch):
+    channel_dir = str(tmp_path)
+    _write_video(channel_dir, 'a', ['great pizza recipe', 'love this pizza'])
+    _write_video(channel_dir, 'b', ['guitar solo was amazing'])
+    corpus = preprocess_channel(channel_dir, workers=1)
+    assert corpus.videos == [['a', 2], ['b', 1]]
+
+    loaded = []
+    original = preprocessing.load_video
+    monkeypatch.setattr(preprocessing, 'load_video', lambda d, v: loaded.append(v) or original(d, v))
+    monkeypatch.setattr(corpus_module, 'load_video', lambda d, v: loaded.append(v) or original(d, v))
+    _write_video(channel_dir, 'c', ['drums and bass guitar'])
+    corpus = preprocess_channel(channel_dir, workers=1)
+    assert loaded == ['c']
+    assert len(corpus) == 4
+    assert corpus.tokens(3) == ['drum', 'bass', 'guitar']
+
+    # Rows are read from their token slices, matching the full matrix
+    rows = corpus.rows(['c', 'a'])
+    assert (corpus.count_matrix(rows) != corpus.count_matrix()[rows]).nnz == 0
+
+
+def test_corpus_rebuilds_when_a_video_changes(tmp_path):
+    channel_dir = str(tmp_path)
+    _write_video(channel_dir, 'a', ['great pizza recipe', 'love this pizza'])
+    _write_video(channel_dir, 'b', ['guitar solo was amazing'])
+    preprocess_channel(channel_dir, workers=1)
+
+    # Same comments, new file: kept
+    _write_video(channel_dir, 'a', ['great pizza recipe', 'love this pizza'])
+    assert len(preprocess_channel(channel_dir, workers=1)) == 3
+
+    _write_video(channel_dir, 'a', ['great pizza recipe'])
+    corpus = preprocess_channel(channel_dir, workers=1)
+    assert corpus.videos == [['a', 1], ['b', 1]]
+    assert [corpus.tokens(i) for i in range(2)] == [['great', 'pizza', 'recipe'], ['guitar', 'solo', 'amazing']]
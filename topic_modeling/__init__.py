@@ -0,0 +1,10 @@
+from .embeddings import embed_channel
+from .embedding_topics import fit_embedding_topics
+from .preprocessing import preprocess_texts, preprocess_channel
+from .online import online_topics, update_online_topics, refresh_online_topics, topic_prevalence
+
+__all__ = [
+    'embed_channel', 'fit_embedding_topics',
+    'preprocess_texts', 'preprocess_channel',
+    'online_topics', 'update_online_topics', 'refresh_online_topics', 'topic_prevalence',
+]
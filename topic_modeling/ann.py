@@ -0,0 +1,159 @@
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+# Rows converted to float32 at a time (keeps memory flat on memory-mapped inputs)
+SCAN_BATCH = 65536
+# Similarity cells (rows x centroids or queries x bucket members) scored per block
+SCORE_CELLS = 2 ** 22
+
+
+def _batch_rows(n_columns):
+    """Rows per block so that a rows x n_columns similarity block holds SCORE_CELLS cells."""
+    return max(1, SCORE_CELLS // max(n_columns, 1))
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest neighbour index for unit-normalized vectors.
+
+    Vectors are bucketed by a k-means coarse quantizer; a query is only compared
+    to the members of its n_probe closest buckets, so a full kNN graph costs
+    roughly n * n_probe * (n / n_lists) dot products instead of n².
+    Similarity is cosine (dot product), distances are 1 - cosine.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, scale=1.0, random_state=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.scale = scale
+        self.random_state = random_state
+        self.centroids = None
+        self.lists = []
+        self.valid = None
+        self._vectors = None
+
+    def _rows(self, start, stop):
+        """Read a slice of the indexed vectors as float32 (dequantizing if needed)."""
+        rows = np.asarray(self._vectors[start:stop], dtype=np.float32)
+        if self.scale != 1.0:
+            rows *= self.scale
+        return rows
+
+    def fit(self, vectors):
+        """Train the coarse quantizer and assign every non-zero vector to a bucket.
+
+        Zero vectors (e.g. emoji-only comments the embedder has no tokens for)
+        are left out of the index: they would all land in the same bucket and
+        have no meaningful neighbours anyway.
+        """
+        self._vectors = vectors
+        n = len(vectors)
+        self.valid = np.zeros(n, dtype=bool)
+        for start in range(0, n, SCAN_BATCH):
+            block = self._rows(start, start + SCAN_BATCH)
+            self.valid[start:start + len(block)] = np.linalg.norm(block, axis=1) > 1e-6
+        valid_idx = np.flatnonzero(self.valid)
+        n_valid = len(valid_idx)
+        if n_valid == 0:
+            self.centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            self.lists = []
+            return self
+
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(n_valid)))
+        n_lists = min(n_lists, n_valid)
+
+        # Train on a sample: the quantizer only needs to roughly partition the space
+        rng = np.random.default_rng(self.random_state)
+        sample_size = min(n_valid, max(n_lists * 40, 10000))
+        sample_idx = np.sort(rng.choice(valid_idx, size=sample_size, replace=False))
+        sample = np.asarray(vectors[sample_idx], dtype=np.float32) * self.scale
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=4096, n_init=1,
+                                 random_state=self.random_state)
+        kmeans.fit(sample)
+        centroids = kmeans.cluster_centers_.astype(np.float32)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids / np.maximum(norms, 1e-12)
+
+        assignments = np.full(n, -1, dtype=np.int32)
+        batch = _batch_rows(n_lists)
+        for start in range(0, n, batch):
+            block = self._rows(start, start + batch)
+            assignments[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        assignments[~self.valid] = -1
+
+        order = np.argsort(assignments, kind='stable')
+        order = order[assignments[order] >= 0]
+        bounds = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+        return self
+
+    def _probe(self):
+        """Return the n_probe closest buckets of every indexed vector.
+
+        Blocks are sized so rows x n_lists stays at SCORE_CELLS, and the top
+        buckets are taken by repeated argmax on the block itself, so no
+        full-size index array is ever built.
+        """
+        n = len(self._vectors)
+        n_lists = len(self.lists)
+        n_probe = min(self.n_probe, n_lists)
+        probes = np.empty((n, n_probe), dtype=np.int32)
+        batch = _batch_rows(n_lists)
+        sims = np.empty((min(batch, n), n_lists), dtype=np.float32)
+        for start in range(0, n, batch):
+            block = self._rows(start, start + batch)
+            block_sims = sims[:len(block)]
+            np.matmul(block, self.centroids.T, out=block_sims)
+            row_idx = np.arange(len(block))
+            for p in range(n_probe):
+                best = np.argmax(block_sims, axis=1)
+                probes[start:start + len(block), p] = best
+                block_sims[row_idx, best] = -np.inf
+        return probes
+
+    def kneighbors(self, k):
+        """Approximate k nearest neighbours of every indexed vector (excluding itself).
+
+        Returns (distances, indices), both of shape (n, k), sorted by distance.
+        Missing neighbours (tiny buckets, zero vectors) have index -1 and distance inf.
+        """
+        n = len(self._vectors)
+        best_sims = np.full((n, k), -np.inf, dtype=np.float32)
+        best_idx = np.full((n, k), -1, dtype=np.int64)
+
+        if not self.lists:
+            return np.full((n, k), np.inf, dtype=np.float32), best_idx
+
+        # Invert the probe table: for each bucket, which (non-zero) vectors need to scan it
+        probes = self._probe()
+        flat_lists = probes.ravel()
+        flat_queries = np.repeat(np.arange(n), probes.shape[1])
+        indexed = self.valid[flat_queries]
+        flat_lists, flat_queries = flat_lists[indexed], flat_queries[indexed]
+        order = np.argsort(flat_lists, kind='stable')
+        bounds = np.searchsorted(flat_lists[order], np.arange(len(self.lists) + 1))
+
+        for list_id, members in enumerate(self.lists):
+            queries = flat_queries[order[bounds[list_id]:bounds[list_id + 1]]]
+            if len(members) == 0 or len(queries) == 0:
+                continue
+            member_vecs = np.asarray(self._vectors[members], dtype=np.float32) * self.scale
+            batch = _batch_rows(len(members) + k)
+            for start in range(0, len(queries), batch):
+                q = queries[start:start + batch]
+                query_vecs = np.asarray(self._vectors[q], dtype=np.float32) * self.scale
+                sims = query_vecs @ member_vecs.T
+                sims[q[:, None] == members[None, :]] = -np.inf
+
+                # Merge this bucket's candidates into the running top-k
+                cand_sims = np.concatenate([best_sims[q], sims], axis=1)
+                cand_idx = np.concatenate(
+                    [best_idx[q], np.broadcast_to(members, sims.shape)], axis=1)
+                top = np.argpartition(-cand_sims, k - 1, axis=1)[:, :k]
+                best_sims[q] = np.take_along_axis(cand_sims, top, axis=1)
+                best_idx[q] = np.take_along_axis(cand_idx, top, axis=1)
+
+        order = np.argsort(-best_sims, axis=1)
+        best_sims = np.take_along_axis(best_sims, order, axis=1)
+        best_idx = np.take_along_axis(best_idx, order, axis=1)
+        distances = np.where(best_idx >= 0, np.clip(1.0 - best_sims, 0.0, 2.0), np.inf)
+        return distances.astype(np.float32), best_idx
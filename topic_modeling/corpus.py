@@ -0,0 +1,36 @@
+import os
+import json
+
+
+def list_video_ids(channel_dir):
+    """Return the IDs of all videos saved for a channel, sorted for a stable order."""
+    videos_dir = os.path.join(channel_dir, 'videos')
+    if not os.path.isdir(videos_dir):
+        return []
+    return sorted(f[:-len('.json')] for f in os.listdir(videos_dir) if f.endswith('.json'))
+
+
+def load_video(channel_dir, video_id):
+    """Load a single video JSON file, or None if it is missing or unreadable."""
+    filepath = os.path.join(channel_dir, 'videos', f"{video_id}.json")
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def iter_channel_videos(channel_dir, video_ids=None):
+    """Yield (video_id, video_data) for every readable video of a channel.
+
+    If video_ids is provided, only those videos are loaded (in that order).
+    """
+    for video_id in (video_ids if video_ids is not None else list_video_ids(channel_dir)):
+        video_data = load_video(channel_dir, video_id)
+        if video_data is not None:
+            yield video_id, video_data
+
+
+def comment_texts(video_data):
+    """Return the text of every comment of a video (empty string when missing)."""
+    return [c.get('text') or '' for c in video_data.get('comments', [])]
@@ -0,0 +1,152 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import HDBSCAN
+
+from .ann import IVFIndex
+from .embeddings import embed_channel, cached_videos, DEFAULT_DTYPE
+from .preprocessing import preprocess_channel
+
+TOP_WORDS = 10
+REPRESENTATIVE_DOCS = 3
+
+
+def cluster_embeddings(vectors, scale=1.0, n_neighbors=15, min_topic_size=10):
+    """HDBSCAN-cluster embeddings from an approximate kNN graph.
+
+    The kNN graph comes from an IVF index, so only n * n_neighbors distances are
+    ever materialized. HDBSCAN runs on that sparse graph, one connected
+    component at a time (it cannot handle disconnected graphs); components
+    smaller than min_topic_size are outliers (-1), and a component HDBSCAN
+    does not split is kept as one topic. Topics are numbered by size.
+    """
+    n = len(vectors)
+    labels = np.full(n, -1, dtype=np.int64)
+    if n < 2:
+        return labels
+
+    k = min(n_neighbors, n - 1)
+    distances, indices = IVFIndex(scale=scale).fit(vectors).kneighbors(k)
+
+    valid = indices >= 0
+    rows = np.repeat(np.arange(n), k)[valid.ravel()]
+    # Sparse precomputed graphs ignore zero entries, so keep exact duplicates connected
+    graph = sparse.csr_matrix((np.maximum(distances[valid], 1e-6), (rows, indices[valid])), shape=(n, n))
+    graph = graph.maximum(graph.T).tocsr()
+
+    min_samples = max(1, min(k, n_neighbors // 3))
+    n_components, components = connected_components(graph, directed=False)
+    next_label = 0
+    for component in range(n_components):
+        members = np.flatnonzero(components == component)
+        if len(members) < min_topic_size:
+            continue
+        sub_labels = HDBSCAN(min_cluster_size=min_topic_size, min_samples=min_samples,
+                             metric='precomputed', copy=True).fit_predict(graph[members][:, members])
+        clustered = sub_labels >= 0
+        if clustered.any():
+            labels[members[clustered]] = sub_labels[clustered] + next_label
+            next_label += int(sub_labels.max()) + 1
+        else:
+            # No split inside a well-separated component: the component itself is the topic
+            labels[members] = next_label
+            next_label += 1
+
+    # Renumber topics by size (largest = 0)
+    if next_label == 0:
+        return labels
+    sizes = np.bincount(labels[labels >= 0], minlength=next_label)
+    remap = np.full(next_label + 1, -1, dtype=np.int64)  # Last slot maps outliers (-1) to -1
+    remap[np.argsort(-sizes, kind='stable')] = np.arange(next_label)
+    return remap[labels]
+
+
+def class_tfidf(counts, terms, labels, n_topics, top_n=TOP_WORDS):
+    """BERTopic-style c-TF-IDF: top words per topic from per-topic term counts.
+
+    counts is the document-term matrix of the preprocessed corpus (stopwords
+    removed, lemmatized), with rows aligned to labels.
+    """
+    if n_topics == 0:
+        return []
+    mask = labels >= 0
+    counts = counts[np.flatnonzero(mask)]
+
+    # Keep terms used in at least two comments
+    doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+    keep = np.flatnonzero(doc_freq >= 2)
+    if len(keep) == 0:
+        return [[] for _ in range(n_topics)]
+    counts = counts[:, keep]
+    terms = np.asarray(terms, dtype=object)[keep]
+
+    # Sum document counts into one row per topic
+    topic_labels = labels[mask]
+    onehot = sparse.csr_matrix((np.ones(len(topic_labels)), (topic_labels, np.arange(len(topic_labels)))),
+                               shape=(n_topics, len(topic_labels)))
+    tf = (onehot @ counts).tocsr().astype(np.float64)
+
+    words_per_topic = np.asarray(tf.sum(axis=1)).ravel()
+    avg_words = words_per_topic.mean()
+    word_freq = np.asarray(tf.sum(axis=0)).ravel()
+    idf = np.log1p(avg_words / np.maximum(word_freq, 1))
+    tf = sparse.diags(1.0 / np.maximum(words_per_topic, 1)) @ tf
+    scores = (tf @ sparse.diags(idf)).tocsr()
+
+    topics_words = []
+    for topic in range(n_topics):
+        row = scores.getrow(topic)
+        top = row.indices[np.argsort(-row.data)[:top_n]]
+        topics_words.append([str(terms[i]) for i in top])
+    return topics_words
+
+
+def representative_docs(vectors, scale, labels, n_topics, top_n=REPRESENTATIVE_DOCS):
+    """Indices of the comments closest to each topic's centroid."""
+    dim = vectors.shape[1]
+    centroids = np.zeros((n_topics, dim), dtype=np.float64)
+    for start in range(0, len(vectors), 65536):
+        block = np.asarray(vectors[start:start + 65536], dtype=np.float32) * scale
+        block_labels = labels[start:start + 65536]
+        mask = block_labels >= 0
+        np.add.at(centroids, block_labels[mask], block[mask])
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    docs = []
+    for topic in range(n_topics):
+        members = np.flatnonzero(labels == topic)
+        sims = (np.asarray(vectors[members], dtype=np.float32) * scale) @ centroids[topic]
+        docs.append(members[np.argsort(-sims)[:top_n]].tolist())
+    return docs
+
+
+def fit_embedding_topics(channel_dir, dtype=DEFAULT_DTYPE, n_neighbors=15, min_topic_size=10, workers=None):
+    """Embedding-based (BERTopic-style) topic modeling for one channel.
+
+    Embeds comments (cached on disk), clusters them through the ANN kNN graph
+    and describes each cluster with c-TF-IDF keywords and sample comments.
+    """
+    vectors, scale, texts, info = embed_channel(channel_dir, dtype=dtype, workers=workers)
+    labels = cluster_embeddings(vectors, scale, n_neighbors=n_neighbors, min_topic_size=min_topic_size)
+    n_topics = int(labels.max()) + 1 if len(labels) else 0
+
+    # Keywords come from the stored token-id corpus, reordered to the embedding rows
+    corpus = preprocess_channel(channel_dir, workers=workers)
+    rows = corpus.rows([vid for vid, _ in cached_videos(channel_dir, dtype)])
+    words = class_tfidf(corpus.count_matrix(rows), corpus.vocab, labels, n_topics)
+    docs = representative_docs(vectors, scale, labels, n_topics) if n_topics else []
+    sizes = np.bincount(labels[labels >= 0], minlength=n_topics)
+
+    topics = [{
+        'topic': topic,
+        'size': int(sizes[topic]),
+        'words': words[topic],
+        'representative_comments': [texts[i] for i in docs[topic]],
+    } for topic in range(n_topics)]
+
+    return {
+        'embedding': info,
+        'total_comments': len(texts),
+        'outliers': int((labels < 0).sum()),
+        'topics': topics,
+    }
@@ -0,0 +1,279 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from .corpus import list_video_ids, iter_channel_videos, comment_texts
+
+# Local sentence-transformers model (used when present, never downloaded)
+SENTENCE_MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'models', 'sentence-model')
+
+# Hashing + SVD fallback settings
+HASH_FEATURES = 2 ** 16
+FALLBACK_DIM = 128
+SVD_SAMPLE_SIZE = 50000
+
+# Comments embedded per batch / per worker task
+BATCH_SIZE = 4096
+EMBEDDING_DTYPES = ('float16', 'int8')
+DEFAULT_DTYPE = 'float16'
+INT8_SCALE = 1.0 / 127  # Vectors are unit-normalized, so components fit in [-1, 1]
+
+CACHE_DIRNAME = 'embeddings'
+
+_worker_components = None
+
+
+def _hashing_vectorizer():
+    return HashingVectorizer(n_features=HASH_FEATURES, alternate_sign=False, norm=None,
+                             ngram_range=(1, 2), strip_accents='unicode')
+
+
+def _hash_texts(texts):
+    """Hash texts into sublinear-tf, L2-normalized sparse rows."""
+    X = _hashing_vectorizer().transform(texts)
+    X.data = np.log1p(X.data)
+    return normalize(X)
+
+
+def _init_hash_worker(components_path):
+    """Process pool initializer: map the SVD basis once per worker."""
+    global _worker_components
+    _worker_components = np.load(components_path, mmap_mode='r')
+
+
+def _embed_hashed_batch(texts, components=None):
+    """Embed a batch of texts with the hashing + SVD projection."""
+    components = _worker_components if components is None else components
+    vectors = np.asarray(_hash_texts(texts) @ components.T, dtype=np.float32)
+    return normalize(vectors)
+
+
+def _batches(texts, size=BATCH_SIZE):
+    return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+
+class SentenceModelEmbedder:
+    """Embed with a sentence-transformers model stored in SENTENCE_MODEL_DIR (CPU only)."""
+
+    backend = 'sentence-transformers'
+
+    def __init__(self, model_dir=SENTENCE_MODEL_DIR):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = os.path.basename(os.path.normpath(model_dir))
+        self.model = SentenceTransformer(model_dir, device='cpu')
+
+    def prepare(self, cache_dir, texts):
+        return None
+
+    def basis_is_stale(self, meta, n_texts):
+        return False
+
+    def embed(self, texts):
+        # torch already spreads each batch over all cores
+        vectors = self.model.encode(texts, batch_size=256, normalize_embeddings=True,
+                                    convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HashingSVDEmbedder:
+    """Offline fallback: hashed word/bigram counts projected on a persisted SVD basis."""
+
+    backend = 'hashing-svd'
+    model_name = f'hash{HASH_FEATURES}-svd{FALLBACK_DIM}'
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.components_path = None
+        self.components = None
+
+    def prepare(self, cache_dir, texts):
+        """Load the SVD basis from the cache, fitting it on a sample on first use.
+
+        Returns the number of comments the basis was fitted on (None if loaded).
+        """
+        self.components_path = os.path.join(cache_dir, 'svd_components.npy')
+        fit_samples = None
+        if not os.path.exists(self.components_path):
+            rng = np.random.default_rng(42)
+            sample_size = min(len(texts), SVD_SAMPLE_SIZE)
+            sample = [texts[i] for i in rng.choice(len(texts), size=sample_size, replace=False)]
+            X = _hash_texts(sample)
+            n_components = max(1, min(FALLBACK_DIM, X.shape[0] - 1, X.shape[1] - 1))
+            svd = TruncatedSVD(n_components=n_components, random_state=42)
+            svd.fit(X)
+            np.save(self.components_path, svd.components_.astype(np.float32))
+            fit_samples = sample_size
+        self.components = np.load(self.components_path, mmap_mode='r')
+        return fit_samples
+
+    def basis_is_stale(self, meta, n_texts):
+        """Whether the cached basis was fitted on too small a corpus compared to the current one.
+
+        A basis fitted on few comments has few dimensions and misses most of the
+        vocabulary; refit once the corpus has at least doubled (or can now give
+        more dimensions).
+        """
+        fit_samples = meta.get('svd_samples') or 0
+        dim = meta.get('dim') or 0
+        undersampled = fit_samples < SVD_SAMPLE_SIZE and n_texts >= 2 * fit_samples
+        too_narrow = dim < FALLBACK_DIM and n_texts > dim + 1
+        return undersampled or too_narrow
+
+    def embed(self, texts):
+        batches = _batches(texts)
+        if self.workers <= 1 or len(batches) <= 1:
+            return np.vstack([_embed_hashed_batch(b, self.components) for b in batches])
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_hash_worker,
+                                 initargs=(self.components_path,)) as executor:
+            return np.vstack(list(executor.map(_embed_hashed_batch, batches)))
+
+
+def get_embedder(workers=None):
+    """Use the local sentence model when available, else the hashing + SVD fallback."""
+    if os.path.isdir(SENTENCE_MODEL_DIR):
+        try:
+            return SentenceModelEmbedder()
+        except ImportError:
+            pass
+    return HashingSVDEmbedder(workers=workers)
+
+
+def quantize(vectors, dtype):
+    """Convert unit-normalized float32 vectors to the on-disk dtype."""
+    if dtype == 'int8':
+        return np.clip(np.rint(vectors / INT8_SCALE), -127, 127).astype(np.int8)
+    return vectors.astype(np.float16)
+
+
+def _load_meta(cache_dir):
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            pass
+    return None
+
+
+def _save_meta(cache_dir, meta):
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def _bin_path(cache_dir, dtype):
+    return os.path.join(cache_dir, f'embeddings.{dtype}.bin')
+
+
+def _reset_cache(cache_dir):
+    filenames = ['meta.json', 'svd_components.npy'] + [f'embeddings.{d}.bin' for d in EMBEDDING_DTYPES]
+    for filename in filenames:
+        path = os.path.join(cache_dir, filename)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def cached_videos(channel_dir, dtype=DEFAULT_DTYPE):
+    """[video_id, comment count] pairs of a dtype's cache, in row order."""
+    meta = _load_meta(os.path.join(channel_dir, CACHE_DIRNAME))
+    cache = (meta or {}).get('caches', {}).get(dtype)
+    return cache['videos'] if cache else []
+
+
+def embed_channel(channel_dir, dtype=DEFAULT_DTYPE, workers=None):
+    """Embed every comment of a channel, reusing the on-disk cache across runs.
+
+    Embeddings live in <channel>/embeddings/embeddings.<dtype>.bin as raw
+    row-major float16 or int8 matrices, one per dtype, so switching dtype does
+    not discard the other. meta.json records the model and basis shared by all
+    of them, and for each dtype its shape and which videos (and how many
+    comments each) it covers. Only videos missing from a cache are embedded
+    and appended. If a cached video changed, that dtype's cache is rebuilt; if
+    the model changed or the fallback SVD basis was fitted on a much smaller
+    corpus, every cache is rebuilt.
+
+    Returns (vectors, scale, texts, info): vectors is a read-only memmap,
+    multiply by scale to get unit-normalized float vectors; texts are aligned
+    with its rows.
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"dtype must be one of {', '.join(EMBEDDING_DTYPES)}")
+
+    cache_dir = os.path.join(channel_dir, CACHE_DIRNAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    bin_path = _bin_path(cache_dir, dtype)
+    embedder = get_embedder(workers)
+
+    # Load all current comments; keep cached videos first, in cache order
+    videos = {vid: comment_texts(data) for vid, data in iter_channel_videos(channel_dir)}
+    n_texts = sum(len(t) for t in videos.values())
+    meta = _load_meta(cache_dir)
+    model_valid = (
+        meta is not None
+        and 'caches' in meta
+        and meta.get('backend') == embedder.backend
+        and meta.get('model') == embedder.model_name
+        and not (meta.get('dim') and embedder.basis_is_stale(meta, n_texts))
+    )
+    if not model_valid:
+        _reset_cache(cache_dir)
+        meta = {'backend': embedder.backend, 'model': embedder.model_name,
+                'dim': None, 'svd_samples': None, 'caches': {}}
+
+    cache = meta['caches'].get(dtype)
+    cache_valid = (
+        cache is not None
+        and os.path.exists(bin_path)
+        and os.path.getsize(bin_path) == cache['rows'] * (meta['dim'] or 0) * np.dtype(dtype).itemsize
+        and all(vid in videos and len(videos[vid]) == count for vid, count in cache['videos'])
+    )
+    if not cache_valid:
+        if os.path.exists(bin_path):
+            os.remove(bin_path)
+        cache = meta['caches'][dtype] = {'rows': 0, 'videos': []}
+
+    cached_ids = [vid for vid, _ in cache['videos']]
+    cached_set = set(cached_ids)
+    new_ids = [vid for vid in list_video_ids(channel_dir) if vid in videos and vid not in cached_set]
+
+    texts = [t for vid in cached_ids for t in videos[vid]]
+    new_texts = [t for vid in new_ids for t in videos[vid]]
+
+    if new_ids:
+        if new_texts:
+            fit_samples = embedder.prepare(cache_dir, [t for v in videos.values() for t in v])
+            if fit_samples is not None:
+                meta['svd_samples'] = fit_samples
+            with open(bin_path, 'ab') as f:
+                for start in range(0, len(new_texts), BATCH_SIZE * 16):
+                    vectors = embedder.embed(new_texts[start:start + BATCH_SIZE * 16])
+                    meta['dim'] = int(vectors.shape[1])
+                    f.write(quantize(vectors, dtype).tobytes())
+        cache['videos'].extend([vid, len(videos[vid])] for vid in new_ids)
+        cache['rows'] += len(new_texts)
+        _save_meta(cache_dir, meta)
+        texts += new_texts
+
+    if cache['rows'] == 0:
+        vectors = np.zeros((0, meta['dim'] or 0), dtype=dtype)
+    else:
+        vectors = np.memmap(bin_path, dtype=dtype, mode='r', shape=(cache['rows'], meta['dim']))
+
+    info = {
+        'backend': meta['backend'],
+        'model': meta['model'],
+        'dtype': dtype,
+        'dim': meta['dim'],
+        'rows': cache['rows'],
+        'new_rows': len(new_texts),
+    }
+    return vectors, (INT8_SCALE if dtype == 'int8' else 1.0), texts, info
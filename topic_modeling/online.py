@@ -0,0 +1,241 @@
+import os
+import json
+import shutil
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction import FeatureHasher
+
+from .corpus import load_video
+from .preprocessing import preprocess_channel, PREPROCESSING_VERSION
+
+# Hashed vocabulary: fixed size, so new words never change the model's shape
+HASH_FEATURES = 2 ** 18
+DEFAULT_TOPICS = 20
+PARTIAL_FIT_BATCH = 4096
+TOP_WORDS = 10
+# Term counts kept to name hashed features (pruned to the most frequent)
+MAX_TERMS = 200000
+KEEP_TERMS = 100000
+
+BUCKETS = ('day', 'week', 'month')
+CHECKPOINT_DIRNAME = 'online_topics'
+
+
+def _hasher():
+    return FeatureHasher(n_features=HASH_FEATURES, input_type='string', alternate_sign=False)
+
+
+def _hash_counts(counts, vocab):
+    """Move a corpus count matrix (columns = vocab ids) into the fixed hashed feature space."""
+    used = np.unique(counts.indices)
+    feature_of = np.zeros(counts.shape[1], dtype=np.int32)
+    if len(used):
+        feature_of[used] = _hasher().transform([[vocab[i]] for i in used]).tocsr().indices
+    X = sparse.csr_matrix((counts.data, feature_of[counts.indices], counts.indptr),
+                          shape=(counts.shape[0], HASH_FEATURES))
+    X.sum_duplicates()  # Hash collisions
+    return X
+
+
+def _paths(channel_dir):
+    checkpoint_dir = os.path.join(channel_dir, CHECKPOINT_DIRNAME)
+    return (checkpoint_dir,
+            os.path.join(checkpoint_dir, 'model.joblib'),
+            os.path.join(checkpoint_dir, 'state.json'))
+
+
+def _new_state(n_topics):
+    return {
+        'n_topics': n_topics,
+        'preprocessing': PREPROCESSING_VERSION,
+        'videos': [],
+        'total_comments': 0,
+        'last_updated': None,
+        # Day number (unix time // 86400) -> [comment count, summed topic distribution]
+        'daily': {},
+        'terms': {},
+    }
+
+
+def load_checkpoint(channel_dir):
+    """Load (model, state) for a channel, or (None, None) if there is no checkpoint."""
+    _, model_path, state_path = _paths(channel_dir)
+    if not (os.path.exists(model_path) and os.path.exists(state_path)):
+        return None, None
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return joblib.load(model_path), state
+    except Exception:
+        return None, None
+
+
+def save_checkpoint(channel_dir, model, state):
+    checkpoint_dir, model_path, state_path = _paths(channel_dir)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    joblib.dump(model, model_path + '.tmp')
+    with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(model_path + '.tmp', model_path)
+    os.replace(state_path + '.tmp', state_path)
+
+
+def update_online_topics(channel_dir, n_topics=None, reset=False, workers=None):
+    """Update a channel's online LDA model with the videos saved since its last checkpoint.
+
+    Only comments from videos not in the checkpoint are read from the
+    preprocessed token-id corpus, hashed and fed to partial_fit, so an update
+    costs time proportional to the new data. Their topic distributions are
+    added to daily prevalence totals; older days keep the distributions
+    computed when they were first seen.
+    n_topics=None keeps the checkpoint's topic count (DEFAULT_TOPICS for a
+    new model); passing a different n_topics, changing the preprocessing
+    rules or reset=True starts a new model from scratch.
+    """
+    if n_topics is not None and n_topics < 1:
+        raise ValueError('n_topics must be at least 1')
+
+    model, state = load_checkpoint(channel_dir)
+    if n_topics is None:
+        n_topics = state['n_topics'] if state is not None else DEFAULT_TOPICS
+    fresh = (reset or model is None or state.get('n_topics') != n_topics
+             or state.get('preprocessing') != PREPROCESSING_VERSION)
+    if fresh:
+        shutil.rmtree(_paths(channel_dir)[0], ignore_errors=True)
+        model = LatentDirichletAllocation(n_components=n_topics, learning_method='online',
+                                          batch_size=PARTIAL_FIT_BATCH, random_state=42)
+        state = _new_state(n_topics)
+
+    # New comments come from the stored token-id corpus; only timestamps are read from the JSON
+    corpus = preprocess_channel(channel_dir, workers=workers)
+    known = set(state['videos'])
+    new_videos = [(vid, count) for vid, count in corpus.videos if vid not in known]
+    new_ids = [vid for vid, _ in new_videos]
+
+    timestamps = []
+    for video_id, count in new_videos:
+        video_data = load_video(channel_dir, video_id) or {}
+        stamps = [c.get('timestamp') for c in video_data.get('comments', [])][:count]
+        timestamps.extend(stamps + [None] * (count - len(stamps)))
+
+    counts = corpus.count_matrix(corpus.rows(new_ids))
+    new_comments = counts.shape[0]
+    if new_comments:
+        X = _hash_counts(counts, corpus.vocab)
+        for start in range(0, X.shape[0], PARTIAL_FIT_BATCH):
+            model.partial_fit(X[start:start + PARTIAL_FIT_BATCH])
+
+        # Accumulate topic prevalence per day (comments without a timestamp only train)
+        dated = np.array([ts is not None for ts in timestamps])
+        if dated.any():
+            doc_topics = model.transform(X[np.flatnonzero(dated)])
+            days = np.array([ts for ts in timestamps if ts is not None], dtype=np.int64) // 86400
+            unique_days, inverse = np.unique(days, return_inverse=True)
+            sums = np.zeros((len(unique_days), n_topics))
+            np.add.at(sums, inverse, doc_topics)
+            day_counts = np.bincount(inverse)
+            for day, count, topic_sum in zip(unique_days.tolist(), day_counts.tolist(), sums):
+                entry = state['daily'].setdefault(str(day), [0, [0.0] * n_topics])
+                entry[0] += count
+                entry[1] = (np.asarray(entry[1]) + topic_sum).tolist()
+
+        term_counts = np.asarray(counts.sum(axis=0)).ravel()
+        terms = Counter(state['terms'])
+        terms.update({corpus.vocab[i]: int(term_counts[i]) for i in np.flatnonzero(term_counts)})
+        if len(terms) > MAX_TERMS:
+            terms = Counter(dict(terms.most_common(KEEP_TERMS)))
+        state['terms'] = dict(terms)
+
+    if new_ids or fresh:
+        state['videos'].extend(new_ids)
+        state['total_comments'] += new_comments
+        state['last_updated'] = datetime.now().isoformat()
+        save_checkpoint(channel_dir, model, state)
+
+    return model, state, new_comments
+
+
+def refresh_online_topics(channel_dir):
+    """Fold newly saved videos into an existing checkpoint (no-op if the channel has none)."""
+    _, state = load_checkpoint(channel_dir)
+    if state is None:
+        return 0
+    return update_online_topics(channel_dir)[2]
+
+
+def topic_words(model, state, top_n=TOP_WORDS):
+    """Name each topic with the most frequent known term of its top hashed features."""
+    if not hasattr(model, 'components_'):
+        return [[] for _ in range(state['n_topics'])]
+
+    # Map each hashed feature to its most frequent term
+    terms = sorted(state['terms'].items(), key=lambda kv: -kv[1])
+    feature_terms = {}
+    if terms:
+        indices = _hasher().transform([[t] for t, _ in terms]).tocsr().indices
+        for (term, _), index in zip(terms, indices):
+            feature_terms.setdefault(int(index), term)
+
+    words = []
+    for component in model.components_:
+        topic = []
+        for index in np.argsort(-component):
+            term = feature_terms.get(int(index))
+            if term:
+                topic.append(term)
+            if len(topic) == top_n:
+                break
+        words.append(topic)
+    return words
+
+
+def _bucket_key(day, bucket):
+    date = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=day)
+    if bucket == 'month':
+        return date.strftime('%Y-%m')
+    if bucket == 'week':
+        year, week, _ = date.isocalendar()
+        return f'{year}-W{week:02d}'
+    return date.strftime('%Y-%m-%d')
+
+
+def topic_prevalence(state, bucket='month'):
+    """Topic prevalence over time: mean topic share of the comments in each bucket."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+
+    totals = {}
+    for day, (count, topic_sum) in sorted(state['daily'].items(), key=lambda kv: int(kv[0])):
+        key = _bucket_key(int(day), bucket)
+        entry = totals.setdefault(key, [0, np.zeros(state['n_topics'])])
+        entry[0] += count
+        entry[1] += topic_sum
+
+    keys = sorted(totals)
+    return {
+        'bucket': bucket,
+        'periods': keys,
+        'comment_counts': [totals[k][0] for k in keys],
+        'prevalence': [np.round(totals[k][1] / max(totals[k][0], 1), 4).tolist() for k in keys],
+    }
+
+
+def online_topics(channel_dir, n_topics=None, bucket='month', reset=False):
+    """Update the channel's online topic model and return topics + prevalence over time."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    model, state, new_comments = update_online_topics(channel_dir, n_topics=n_topics, reset=reset)
+    words = topic_words(model, state)
+    return {
+        'n_topics': state['n_topics'],
+        'new_comments': new_comments,
+        'total_comments': state['total_comments'],
+        'last_updated': state['last_updated'],
+        'topics': [{'topic': i, 'words': w} for i, w in enumerate(words)],
+        'evolution': topic_prevalence(state, bucket),
+    }
@@ -0,0 +1,381 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from .corpus import list_video_ids, load_video, iter_channel_videos, comment_texts
+from .stopwords import STOP_WORDS, ALL_STOP_WORDS
+
+# Bump when normalization / tokenization / lemmatization rules change (invalidates caches)
+PREPROCESSING_VERSION = 3
+
+LANGUAGES = ('unknown', 'fr', 'en')  # Index = language code stored on disk
+BATCH_SIZE = 4096
+TOKEN_CACHE_SIZE = 500000
+CORPUS_DIRNAME = 'preprocessed'
+
+# Normalization rules, compiled once per process
+URL_RE = re.compile(r'https?://\S+|www\.\S+')
+MENTION_RE = re.compile(r'@[\w.-]+')
+TIMESTAMP_RE = re.compile(r'\b\d{1,2}:\d{2}(?::\d{2})?\b')
+NUMBER_RE = re.compile(r'\d+')
+ELISION_RE = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu)['’]", re.IGNORECASE)
+APOSTROPHE_RE = re.compile(r"['’]")
+REPEAT_RE = re.compile(r'(\w)\1{2,}')  # "troooop" -> "troop"
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}')
+EMOJI_RE = re.compile(
+    '[\U0001F000-\U0001FAFF\U00002600-\U000027BF\U0000FE00-\U0000FE0F\U0000200D\U00002B00-\U00002BFF]+')
+
+# Stopwords that only exist in one language, used to guess the language of a comment
+_LANGUAGE_MARKERS = {
+    lang: frozenset(words) - frozenset().union(*(w for other, w in STOP_WORDS.items() if other != lang))
+    for lang, words in STOP_WORDS.items()
+}
+
+# Light lemmatization: irregular forms first, then (suffix, replacement, min word length)
+_IRREGULAR = {
+    'fr': {
+        'yeux': 'oeil', 'travaux': 'travail', 'jeux': 'jeu', 'cieux': 'ciel',
+        # -aux plurals of -au / -ail words (the generic rule is -aux -> -al)
+        'tuyaux': 'tuyau', 'matériaux': 'matériau', 'noyaux': 'noyau', 'boyaux': 'boyau',
+        'joyaux': 'joyau', 'fléaux': 'fléau', 'préaux': 'préau', 'landaux': 'landau',
+        'vitraux': 'vitrail', 'coraux': 'corail', 'émaux': 'émail', 'soupiraux': 'soupirail',
+    },
+    'en': {
+        'children': 'child', 'men': 'man', 'women': 'woman', 'feet': 'foot', 'teeth': 'tooth',
+        'movies': 'movie', 'cookies': 'cookie', 'zombies': 'zombie', 'selfies': 'selfie', 'rookies': 'rookie',
+        # -ves plurals of -f / -fe words (other -ves words just lose their s)
+        'leaves': 'leaf', 'wolves': 'wolf', 'shelves': 'shelf', 'halves': 'half', 'calves': 'calf',
+        'selves': 'self', 'elves': 'elf', 'loaves': 'loaf', 'thieves': 'thief',
+        'knives': 'knife', 'lives': 'life', 'wives': 'wife',
+    },
+}
+_INVARIANT = {
+    'fr': frozenset('''
+        gens fois temps pays corps prix avis mois bras dos gros succès progrès accès procès
+        paris virus bus tous plusieurs jamais toujours alors depuis après ailleurs parfois
+        moins trois français anglais dessus dessous puis mais sans dans vers'''.split()),
+    'en': frozenset('always perhaps series species news people physics politics'.split()),
+}
+_SUFFIX_RULES = {
+    'fr': (('eaux', 'eau', 6), ('aux', 'al', 6), ('ées', 'ée', 5), ('és', 'é', 4),
+           ('ies', 'ie', 5), ('ses', 'se', 5), ('ais', 'ais', 4), ('ois', 'ois', 4), ('ss', 'ss', 3),
+           ('s', '', 4)),
+    'en': (('sses', 'ss', 5), ('ies', 'y', 5), ('ss', 'ss', 3),
+           ('us', 'us', 3), ('is', 'is', 3), ('s', '', 4)),
+}
+
+_token_cache = {}
+
+
+def normalize_text(text):
+    """Apply the normalization rules: lowercase, strip URLs, mentions, timestamps, emoji, numbers."""
+    text = unicodedata.normalize('NFC', text).lower()
+    text = URL_RE.sub(' ', text)
+    text = MENTION_RE.sub(' ', text)
+    text = TIMESTAMP_RE.sub(' ', text)
+    text = EMOJI_RE.sub(' ', text)
+    text = NUMBER_RE.sub(' ', text)
+    text = text.replace("aujourd'hui", 'aujourdhui').replace('aujourd’hui', 'aujourdhui')
+    text = ELISION_RE.sub('', text)
+    text = APOSTROPHE_RE.sub(' ', text)
+    return REPEAT_RE.sub(r'\1\1', text)
+
+
+def detect_language(tokens):
+    """Guess 'fr' / 'en' from language-specific stopwords ('unknown' if no evidence)."""
+    scores = {lang: sum(1 for t in tokens if t in markers) for lang, markers in _LANGUAGE_MARKERS.items()}
+    best = max(scores, key=scores.get)
+    if scores[best] == 0 or list(scores.values()).count(scores[best]) > 1:
+        return 'unknown'
+    return best
+
+
+def lemmatize(token, lang):
+    """Fold plural / simple inflected forms to a base form with per-language suffix rules."""
+    if lang not in _SUFFIX_RULES:
+        return token
+    if token in _INVARIANT[lang]:
+        return token
+    irregular = _IRREGULAR[lang].get(token)
+    if irregular:
+        return irregular
+    for suffix, replacement, min_length in _SUFFIX_RULES[lang]:
+        if token.endswith(suffix) and len(token) >= min_length:
+            return token[:len(token) - len(suffix)] + replacement
+    return token
+
+
+def preprocess_text(text):
+    """Preprocess one comment into (language, tokens)."""
+    words = TOKEN_RE.findall(normalize_text(text))
+    lang = detect_language(words)
+    stop_words = STOP_WORDS.get(lang, ALL_STOP_WORDS)
+    return lang, [lemmatize(w, lang) for w in words if w not in stop_words and len(w) > 2]
+
+
+def _preprocess_batch(texts):
+    return [preprocess_text(t) for t in texts]
+
+
+def text_key(text):
+    """Cache key of a comment text."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+
+def preprocess_texts(texts, workers=None):
+    """Preprocess many comments, returning ([language, ...], [tokens, ...]).
+
+    Identical texts are processed once, and results are kept in a per-process
+    cache keyed by text hash, so repeated comments are cheap. The cache lives
+    in memory only and is lost on restart; what persists across runs is the
+    corpus written by preprocess_channel(), which never reprocesses a video.
+    Uncached texts are processed in batches across a process pool.
+    """
+    keys = [text_key(t) for t in texts]
+    found, pending = {}, {}
+    for key, text in zip(keys, texts):
+        if key in found or key in pending:
+            continue
+        cached = _token_cache.get(key)
+        if cached is None:
+            pending[key] = text
+        else:
+            found[key] = cached
+
+    if pending:
+        pending_keys = list(pending)
+        pending_texts = [pending[k] for k in pending_keys]
+        batches = [pending_texts[i:i + BATCH_SIZE] for i in range(0, len(pending_texts), BATCH_SIZE)]
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(batches) <= 1:
+            results = [r for b in batches for r in _preprocess_batch(b)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = [r for batch in executor.map(_preprocess_batch, batches) for r in batch]
+        found.update(zip(pending_keys, results))
+
+        if len(_token_cache) + len(results) > TOKEN_CACHE_SIZE:
+            _token_cache.clear()
+        _token_cache.update(zip(pending_keys, results))
+
+    results = [found[k] for k in keys]
+    return [lang for lang, _ in results], [tokens for _, tokens in results]
+
+
+def encode_tokens(token_lists, vocab=None):
+    """Encode token lists as (token_ids int32, offsets int64), growing vocab (token -> id) in place."""
+    vocab = {} if vocab is None else vocab
+    offsets = np.zeros(len(token_lists) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in token_lists], out=offsets[1:])
+    token_ids = np.fromiter(
+        (vocab.setdefault(t, len(vocab)) for tokens in token_lists for t in tokens),
+        dtype=np.int32, count=int(offsets[-1]))
+    return token_ids, offsets, vocab
+
+
+def count_matrix(token_ids, offsets, n_features):
+    """Document-term count matrix built straight from the token-id format (CSR, no re-tokenization)."""
+    data = np.ones(len(token_ids), dtype=np.float64)
+    # Copies: summing duplicate ids sorts the indices in place (inputs may be read-only memmaps)
+    X = sparse.csr_matrix((data, np.array(token_ids, dtype=np.int32), np.array(offsets, dtype=np.int64)),
+                          shape=(len(offsets) - 1, n_features))
+    X.sum_duplicates()
+    return X
+
+
+class PreprocessedCorpus:
+    """A channel's preprocessed comments in token-id form (memory-mapped).
+
+    The vocabulary is only read from vocab.txt when first needed.
+    """
+
+    def __init__(self, corpus_dir, meta):
+        self.corpus_dir = corpus_dir
+        self.videos = meta['videos']
+        self.vocab_size = meta['vocab_size']
+        n_docs, n_tokens = meta['docs'], meta['tokens']
+        self.offsets = _memmap(os.path.join(corpus_dir, 'offsets.bin'), np.int64, n_docs + 1)
+        self.token_ids = _memmap(os.path.join(corpus_dir, 'tokens.bin'), np.int32, n_tokens)
+        self.langs = _memmap(os.path.join(corpus_dir, 'langs.bin'), np.uint8, n_docs)
+        self._vocab = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def vocab(self):
+        if self._vocab is None:
+            self._vocab = _read_vocab(self.corpus_dir, self.vocab_size)
+        return self._vocab
+
+    def count_matrix(self, rows=None):
+        """Document-term counts of every document, or only of the given rows (read from their token slices)."""
+        if rows is None:
+            return count_matrix(self.token_ids, self.offsets, self.vocab_size)
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, stops = self.offsets[rows], self.offsets[rows + 1]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(stops - starts, out=offsets[1:])
+        positions = np.repeat(starts - offsets[:-1], stops - starts) + np.arange(offsets[-1])
+        return count_matrix(self.token_ids[positions], offsets, self.vocab_size)
+
+    def rows(self, video_ids):
+        """Document indices of the given videos' comments, in that video order."""
+        starts, start = {}, 0
+        for vid, count in self.videos:
+            starts[vid] = (start, count)
+            start += count
+        return np.concatenate([np.arange(s, s + c) for s, c in (starts[vid] for vid in video_ids)]
+                              + [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+
+    def tokens(self, doc):
+        start, stop = self.offsets[doc], self.offsets[doc + 1]
+        return [self.vocab[i] for i in self.token_ids[start:stop]]
+
+    def language_counts(self):
+        counts = np.bincount(self.langs, minlength=len(LANGUAGES))
+        return {lang: int(c) for lang, c in zip(LANGUAGES, counts)}
+
+
+def _memmap(path, dtype, length):
+    if length == 0 or not os.path.exists(path):
+        return np.zeros(length, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+
+def _read_vocab(corpus_dir, vocab_size):
+    """Read the first vocab_size terms of vocab.txt (one term per line, in id order)."""
+    path = os.path.join(corpus_dir, 'vocab.txt')
+    if vocab_size == 0 or not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().split('\n')[:vocab_size]
+
+
+def _file_signature(path):
+    """(size, mtime) of a file, or None if it is missing: tells whether a video JSON was rewritten."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _load_corpus_meta(meta_path):
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            pass
+    return None
+
+
+def _covered_videos_unchanged(channel_dir, meta, signatures):
+    """Check that covered videos still have the comments the corpus was built from.
+
+    Only videos whose file signature changed are parsed again; if one still
+    has the same comment count its new signature is recorded in meta.
+    """
+    for vid, count in meta['videos']:
+        signature = signatures.get(vid)
+        if signature is None:
+            return False
+        if signature == meta['files'].get(vid):
+            continue
+        video_data = load_video(channel_dir, vid)
+        if video_data is None or len(comment_texts(video_data)) != count:
+            return False
+        meta['files'][vid] = signature
+    return True
+
+
+def preprocess_channel(channel_dir, workers=None):
+    """Preprocess a channel's comments into <channel>/preprocessed/, appending only new videos.
+
+    Files: tokens.bin (int32 token ids, all documents concatenated),
+    offsets.bin (int64, document i = tokens[offsets[i]:offsets[i + 1]]),
+    langs.bin (uint8 index into LANGUAGES), vocab.txt (one term per line, in
+    id order) and meta.json (which videos / how many comments are covered,
+    and the size and mtime of their JSON files). This is exactly CSR
+    indices / indptr, so count_matrix() needs no tokenization at all.
+    Only the JSON of new videos (or of covered videos whose file changed) is
+    read, so an up-to-date corpus costs a directory listing and a stat per
+    video. If a covered video lost or gained comments, or the rules changed,
+    the corpus is rebuilt.
+    """
+    corpus_dir = os.path.join(channel_dir, CORPUS_DIRNAME)
+    os.makedirs(corpus_dir, exist_ok=True)
+    meta_path = os.path.join(corpus_dir, 'meta.json')
+    vocab_path = os.path.join(corpus_dir, 'vocab.txt')
+    filenames = ('offsets.bin', 'tokens.bin', 'langs.bin', 'vocab.txt', 'meta.json')
+
+    # Signatures are taken before any JSON is read: a file rewritten meanwhile is re-checked next time
+    video_ids = list_video_ids(channel_dir)
+    signatures = {vid: _file_signature(os.path.join(channel_dir, 'videos', f'{vid}.json')) for vid in video_ids}
+
+    meta = _load_corpus_meta(meta_path)
+    valid = (
+        meta is not None
+        and meta.get('version') == PREPROCESSING_VERSION
+        and 'files' in meta
+        and all(os.path.exists(os.path.join(corpus_dir, name)) and
+                os.path.getsize(os.path.join(corpus_dir, name)) == size
+                for name, size in (('offsets.bin', (meta['docs'] + 1) * 8),
+                                   ('tokens.bin', meta['tokens'] * 4),
+                                   ('langs.bin', meta['docs']),
+                                   ('vocab.txt', meta['vocab_bytes'])))
+    )
+    files_before = dict(meta['files']) if valid else None
+    valid = valid and _covered_videos_unchanged(channel_dir, meta, signatures)
+    if not valid:
+        for name in filenames:
+            if os.path.exists(os.path.join(corpus_dir, name)):
+                os.remove(os.path.join(corpus_dir, name))
+        meta = {'version': PREPROCESSING_VERSION, 'docs': 0, 'tokens': 0, 'vocab_size': 0, 'vocab_bytes': 0,
+                'videos': [], 'files': {}}
+        with open(os.path.join(corpus_dir, 'offsets.bin'), 'wb') as f:
+            f.write(np.zeros(1, dtype=np.int64).tobytes())
+        open(vocab_path, 'wb').close()
+
+    covered = {vid for vid, _ in meta['videos']}
+    new_videos = [(vid, comment_texts(data))
+                  for vid, data in iter_channel_videos(channel_dir, [v for v in video_ids if v not in covered])]
+    changed = meta['files'] != files_before
+    if new_videos:
+        texts = [t for _, video_texts in new_videos for t in video_texts]
+        langs, token_lists = preprocess_texts(texts, workers=workers)
+        vocab_size = meta['vocab_size']
+        vocab = {t: i for i, t in enumerate(_read_vocab(corpus_dir, vocab_size))}
+        token_ids, offsets, vocab = encode_tokens(token_lists, vocab)
+
+        with open(os.path.join(corpus_dir, 'tokens.bin'), 'ab') as f:
+            f.write(token_ids.tobytes())
+        with open(os.path.join(corpus_dir, 'offsets.bin'), 'ab') as f:
+            f.write((offsets[1:] + meta['tokens']).tobytes())
+        with open(os.path.join(corpus_dir, 'langs.bin'), 'ab') as f:
+            f.write(np.array([LANGUAGES.index(lang) for lang in langs], dtype=np.uint8).tobytes())
+        with open(vocab_path, 'ab') as f:
+            f.write(''.join(t + '\n' for t in sorted(vocab, key=vocab.get)[vocab_size:]).encode('utf-8'))
+
+        meta['vocab_size'] = len(vocab)
+        meta['vocab_bytes'] = os.path.getsize(vocab_path)
+        meta['docs'] += len(texts)
+        meta['tokens'] += len(token_ids)
+        for vid, video_texts in new_videos:
+            meta['videos'].append([vid, len(video_texts)])
+            meta['files'][vid] = signatures[vid]
+        changed = True
+
+    if changed:
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    return PreprocessedCorpus(corpus_dir, meta)
@@ -0,0 +1,25 @@
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+FRENCH_STOP_WORDS = frozenset("""
+a ai aie aient aies ait alors as au aucun aura aurai auraient aurais aurait auras aurez auriez
+aurions aurons auront aussi autre aux avaient avais avait avant avec avez aviez avions avoir avons
+ayant ayez ayons bah bien bon c ca car ce ceci cela celle celles celui cependant certains ces cet
+cette ceux chaque chez ci comme comment d dans de des deux devrait dois doit donc dont du elle
+elles en encore es est et etaient etais etait etant ete etes etre eu eue eues eurent eus eusse
+eussent eusses eussiez eussions eut eux faire fais fait faut furent fus fusse fussent fusses
+fussiez fussions fut ici il ils j je jusqu l la le les leur leurs lui m ma mais me meme memes
+mes moi mon n ne ni non nos notre nous on ont ou oui par parce pas peu peut plus pour pourquoi
+qu quand que quel quelle quelles quels qui quoi s sa sans se sera serai seraient serais serait
+seras serez seriez serions serons seront ses si sien soi soient sois soit sommes son sont sous
+soyez soyons suis sur t ta te tes toi ton tous tout toute toutes tres trop tu un une unes uns
+va vais vas vers voila vont vos votre vous vu y à ça ce ceux déjà été êtes être très même mêmes
+où étaient étais était étant là
+cest jai ya jsuis
+""".split())
+
+STOP_WORDS = {
+    'en': ENGLISH_STOP_WORDS,
+    'fr': FRENCH_STOP_WORDS,
+}
+
+ALL_STOP_WORDS = frozenset().union(*STOP_WORDS.values())